@@ -6,6 +6,7 @@ The client driver for Paxos. Sends a value to a proposer node.
 Usage: "python3 clidriver.py [v]" where v is the value the client wants to propose as the global variable.
 """
 from paxos.client import ClientNode
+from paxos.hosts import load_hosts
 import argparse
 
 parser = argparse.ArgumentParser()
@@ -18,17 +19,7 @@ UID = int(args.uid)
 PROPOSER = int(args.uid)
 
 # Read in the hosts.txt file
-PROPOSERS = -1
-ACCEPTORS = -1
-LEARNERS = -1
-HOSTS = []
-with open("./hosts.txt","r") as f:
-    PROPOSERS = int(f.readline().strip("\n").split(" ")[1])
-    ACCEPTORS = int(f.readline().strip("\n").split(" ")[1])
-    LEARNERS = int(f.readline().strip("\n").split(" ")[1])
-    while (line := f.readline().rstrip()):
-        line = line.strip("\n").split(" ")
-        HOSTS.append([line[0],line[1],line[2]])
+(PROPOSERS, ACCEPTORS, LEARNERS), HOSTS = load_hosts()
 
 
 if __name__ == "__main__":
@@ -6,6 +6,7 @@ Driver for consensus nodes.
 Usage: "python3 condriver.py [UID]", where UID is a unique ID
 """
 from paxos.consensus import ConsensusNode
+from paxos.hosts import load_hosts
 import argparse
 
 # Parse the arguments
@@ -15,17 +16,7 @@ args = parser.parse_args()
 UID = int(args.uid)
 
 # Read in the hosts.txt file
-PROPOSERS = -1
-ACCEPTORS = -1
-LEARNERS = -1
-HOSTS = []
-with open("./hosts.txt","r") as f:
-    PROPOSERS = int(f.readline().strip("\n").split(" ")[1])
-    ACCEPTORS = int(f.readline().strip("\n").split(" ")[1])
-    LEARNERS = int(f.readline().strip("\n").split(" ")[1])
-    while (line := f.readline().rstrip()):
-        line = line.strip("\n").split(" ")
-        HOSTS.append([line[0],line[1],line[2]])
+(PROPOSERS, ACCEPTORS, LEARNERS), HOSTS = load_hosts()
 
 
 if __name__ == "__main__":
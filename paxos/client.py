@@ -6,131 +6,199 @@ Clients wait for proposers to tell them they are accepting requests.
 Then clients submit their proposed values.
 """
 from __future__ import annotations
-import abc
-import math
-from socket import *
-from threading import Thread, Lock
+from socket import socket, AF_INET, SOCK_DGRAM
+from threading import Thread, Event
+import queue
 import os
-import sys
-import pickle
-import time
-import random
+from . import wire
+from . import mmsg
+from .hosts import make_hosts
 
 BUFFER_SIZE = 4096
 
+RETRY_TIMEOUT = 1.0 # How long wait listens for SET before forwarding the value again
+CLEANUP_TIMEOUT = 5.0 # Longest CleanupNode waits for every learner to announce the decided value
+
 DEBUG = False
 
 class ClientNode():
-    def __init__(self, mode_counts: tuple[int], hosts: List[List[str]], uid: int, v: int, proposer: int):
+    def __init__(self, mode_counts: tuple[int, int, int], hosts: list[list], uid: int, v: int, proposer: int):
         """
         Params:
             mode_counts (tuple[int]): tuple (proposers,acceptors,learners) of the counts for the 3 different modes
-            hosts (List[Lint[int]]): List of lists [hostname, port, consensus or client] for the hosts
+            hosts (list[list]): List of lists [hostname, port, consensus or client] for the hosts (port is an int)
             uid (int): Unique identifier for this host
             v (int): The value the client wants to set the global variable to
             proposer (int): The proposer ID the client wants to send to (note that this is calculated by 
                             proposer index = (desired ID) modulo (length of proposer))
         """
         if DEBUG: print(f"Client launched with v={v}")
-        self.v = int(v)
+        self.v: int = int(v) # Converted once here; everything else uses the int
         PROPOSERS = mode_counts[0]
         ACCEPTORS = mode_counts[1]
         LEARNERS = mode_counts[2]
-        self.hosts = hosts
-        self.host_info = hosts[uid] # host_info is a list [hostname, port, consensus or client]
+        self.hosts = make_hosts(hosts) # Host tuples (hostname, port, cli or con, addr), indexed by uid
+        self.host_info = self.hosts[uid]
         self.uid = uid
         self.proposer = proposer
-        self.port = int(self.host_info[1])
+        self.port: int = self.host_info.port
         if DEBUG: print(f'\nCLILIB CALLED for {uid} w/ val {self.v}:\t{PROPOSERS},{ACCEPTORS},{LEARNERS},{self.host_info}')
         self.chosen_proposer = -1
-        #self.udp_listen_for_proposers()
+        self.proposer_addr = None # (hostname, port) of the chosen proposer
+        self.term_addrs = [host.addr for host in self.hosts] # Every host is sent TERM on cleanup
+        self.learner_count = LEARNERS
+        self.learners_heard = set() # UIDs of the learners that have sent SET to this client
+        self.decided = Event() # Set once every learner has sent SET, i.e. every client has been told the value
+        wire.check_fits(sum(mode_counts), BUFFER_SIZE)
+        self.receiver = mmsg.Receiver(BUFFER_SIZE) # Preallocated buffers for batched receives
+        # One persistent socket for sending and one for receiving, reused for the lifetime of the client
+        self.send_socket = mmsg.tune_socket(socket(AF_INET, SOCK_DGRAM))
+        self.recv_socket = mmsg.tune_socket(socket(AF_INET, SOCK_DGRAM), ("", self.port))
+        # FWD and TERM never change, so serialize them once up front rather than on every send
+        self.fwd_message = wire.pack("FWD",self.v,self.uid)
+        self.term_message = wire.pack("TERM","",self.uid)
+        # Connected to the chosen proposer once START arrives; FWD (and its retries) always goes there
+        self.proposer_socket = socket(AF_INET, SOCK_DGRAM)
+
+        # A single listener thread owns the receive socket for the client's whole lifetime
+        # It stores the START role lists in start_roles (setting start_received) and queues (header, value) pairs of every
+        # other message for wait
+        self.start_roles = None
+        self.start_received = Event()
+        self.message_queue = queue.SimpleQueue() # Only put by the listener and got by wait, both thread-safe
+        self.listener = Thread(target=self.udp_listen, name=f"listener{self.uid}:{self.port}", daemon=True)
+        self.listener.start()
     
     def Set(self, VAL) -> None:
         """
         Forwards VAL to a proposer for use in Paxos
+        VAL is the value the client was launched with, already stored as an int in self.v
         """
-        time.sleep(0.1) # Wait a short time for other nodes to prep
-        VAL = int(VAL)
-        assert(self.v == VAL)
-        self.udp_send("FWD",VAL,self.hosts[self.chosen_proposer][0],self.hosts[self.chosen_proposer][1])
+        if self.proposer_addr is None: # proposer_socket is only connected once InitializeNode has seen START
+            raise RuntimeError("Set called before InitializeNode: START has not arrived, so no proposer is chosen")
+        self.forward()
         self.wait() # Wait for a value to arrive
+
+    def forward(self) -> None:
+        """
+        Sends this client's value to its chosen proposer.
+        """
+        # The socket is connected, so the kernel reuses the cached route instead of looking it up per send,
+        # and writing to its fd directly skips the socket wrapper's argument parsing and timeout handling
+        try:
+            os.write(self.proposer_socket.fileno(), self.fwd_message)
+        except ConnectionRefusedError:
+            pass # An earlier datagram bounced (proposer not up or gone); wait retries the forward
     
     def wait(self) -> None:
         """
         Waits for a decided on value to arrive
         """
-        with socket(AF_INET, SOCK_DGRAM) as udp_socket:
+        get = self.message_queue.get # Bound once so the loop does a local lookup
+        terminated = False # Set once another client has sent TERM
+        while True:
             try:
-                udp_socket.bind(("", self.port))
-                while True:
-                    # Receive and deserialize message
-                    # Message is a dictionary with keys HEADER, MESSAGE, RECIPIENT, PORT, and SENDERID
-                    message, client_address = udp_socket.recvfrom(BUFFER_SIZE)
-                    message = pickle.loads(message)
-                    if message["HEADER"] == "SET":
-                        chosen_value = message["MESSAGE"]
-                        print("Final message received by client from learner:",chosen_value)
-                        break
-                    else:
-                        raise Exception("Message sent before start to client, or corrupted/incorrect.")
-                
-            finally:
-                udp_socket.close()
+                message = get(timeout=RETRY_TIMEOUT)
+            except queue.Empty:
+                if terminated: # The system shut down and no value ever arrived
+                    raise Exception("Message sent before start to client, or corrupted/incorrect.")
+                # The FWD or the round's messages may have been dropped, so propose again rather than hang
+                if DEBUG: print(f"No value received by client {self.uid}, forwarding {self.v} again")
+                self.forward()
+                continue
+            header, chosen_value = message
+            if header == "SET":
+                print("Final message received by client from learner:",chosen_value)
+                return
+            elif header == "TERM":
+                # Another client was told the value first; the learner's SET to this client may still be in flight
+                terminated = True
+            else:
+                raise Exception("Message sent before start to client, or corrupted/incorrect.")
 
     def InitializeNode(self) -> None:
         """
         Waits for proposers to say they are ready for proposals.
         """
-        with socket(AF_INET, SOCK_DGRAM) as udp_socket:
-            try:
-                udp_socket.bind(("", self.port))
-                # Receive and deserialize message
-                # Message is a dictionary with keys HEADER, MESSAGE, RECIPIENT, and PORT
-                message, client_address = udp_socket.recvfrom(BUFFER_SIZE)
-                message = pickle.loads(message)
-                if message["HEADER"] == "START":
-                    roles_tuple = message["MESSAGE"]
-                    proposers = roles_tuple[0]
-                    proposer_idx = self.proposer % len(proposers)
-                    self.chosen_proposer = proposers[proposer_idx]
-                else:
-                    raise Exception("Message sent before start to client, or corrupted/incorrect.")
-                
-            finally:
-                udp_socket.close()
+        # The listener thread sets start_received when START arrives
+        self.start_received.wait()
+        roles_tuple = self.start_roles
+        proposers = roles_tuple[0]
+        proposer_idx = self.proposer % len(proposers)
+        self.chosen_proposer = proposers[proposer_idx]
+        self.proposer_addr = self.hosts[self.chosen_proposer].addr
+        self.proposer_socket.connect(self.proposer_addr)
 
     def CleanupNode(self) -> None:
         """
         When a consensus is reached, at least one client will progress to call CleanupNode.
         This will signal all processes to shut down.
         """
-        time.sleep(5)
-        # Multicast TERM messages
-        for host in self.hosts:
-            self.udp_send("TERM","","localhost",host[1])
+        # Rather than sleeping a fixed time, wait until every learner has announced the decided value
+        # (a learner multicasts SET to every client, so all clients have then been told), up to CLEANUP_TIMEOUT
+        self.decided.wait(timeout=CLEANUP_TIMEOUT)
+        # Multicast TERM messages, batched into as few syscalls as possible
+        mmsg.sendmmsg(self.send_socket, [(self.term_message, addr) for addr in self.term_addrs])
+        self.proposer_socket.close()
+        self.send_socket.close()
+        self.recv_socket.close()
         os._exit(0)
 
-    def udp_send(self, header: str, message, recipient: str, port: int) -> None:
+    def udp_listen(self) -> None:
+        """
+        Listen for incoming UDP messages, deserialize, and hand them to the waiting methods.
+        """
+        drain = self.receiver.drain
+        peek_tag = wire.peek_tag
+        # Dispatch on the tag byte, so the common messages never build a full message dictionary
+        handlers = {wire.START: self.on_start, wire.SET: self.on_set, wire.TERM: self.on_term}
+        on_other = self.on_other
+        while True:
+            # Drain everything queued on each wake, one batch at a time, then handle each message
+            for batch in drain(self.recv_socket):
+                for message in batch:
+                    handlers.get(peek_tag(message), on_other)(message)
+
+    def on_start(self, message) -> None:
+        """
+        Stores the role lists from the first START and wakes InitializeNode.
+        """
+        if not self.start_received.is_set():
+            message = wire.unpack(message)
+            if message is None: # Malformed START; drop it and keep waiting for a good one
+                return
+            self.start_roles = message["MESSAGE"]
+            self.start_received.set()
+
+    def on_set(self, message) -> None:
+        """
+        Records which learner sent the decided value, and queues the value for wait.
         """
-        All outgoing messages are sent through this handler.
+        if len(message) < wire.FIXED.size: # The tag was only peeked, so a short SET is dropped here
+            return
+        _, _, senderid, chosen_value = wire.FIXED.unpack_from(message)
+        self.learner_heard(senderid)
+        self.message_queue.put(("SET", chosen_value))
 
-        Parameters:
-            header (str): The header that defines the message type
-            message (str): The raw string message to send
-            recipient (str): The hostname of the recipient
-            port (int): The port of the recipient 
+    def on_term(self, message) -> None:
         """
+        Another client is already shutting the system down.
+        """
+        self.decided.set()
+        self.message_queue.put(("TERM", 0))
 
-        # Define and serialize the message to byte form before sending
-        message =   {
-                        'HEADER': header,
-                        'MESSAGE': message,
-                        'RECIPIENT': recipient,
-                        'PORT': int(port)
-                    }
-        message = pickle.dumps(message)
+    def on_other(self, message) -> None:
+        """
+        Queues any other Paxos message so wait can report it; anything else is dropped.
+        """
+        message = wire.unpack(message)
+        if message is not None:
+            self.message_queue.put((message["HEADER"], message["MESSAGE"]))
 
-        # Send the message over UDP
-        with socket(AF_INET, SOCK_DGRAM) as udp_socket:
-            udp_socket.sendto(message, (recipient, int(port)))
-    
\ No newline at end of file
+    def learner_heard(self, uid: int) -> None:
+        """
+        Records that the learner with the given UID has sent SET.
+        """
+        self.learners_heard.add(uid)
+        if len(self.learners_heard) >= self.learner_count:
+            self.decided.set()
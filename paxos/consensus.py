@@ -5,17 +5,28 @@ Implements the ConsensusNode class (proposer, acceptor, and learner roles in Pax
 """
 from __future__ import annotations
 import abc
-import math
-from socket import *
-from threading import Thread, Lock
+from socket import socket, AF_INET, SOCK_DGRAM, IPPROTO_IP
+from socket import IP_ADD_MEMBERSHIP, IP_MULTICAST_IF, IP_MULTICAST_LOOP, inet_aton
+from threading import Thread, Event, local
+from collections import defaultdict
+from typing import Callable
+import queue
+import selectors
 import os
 import sys
-import pickle
 import time
 import random
+from . import wire
+from .wire import Role
+from . import mmsg
+from .hosts import Host, make_hosts
 
 BUFFER_SIZE = 4096
 
+# Values forwarded within BATCH_WINDOW seconds of each other (at most BATCH_SIZE of them) share one proposal round
+BATCH_WINDOW = 0.001
+BATCH_SIZE = 32
+
 PROPOSERS = -1
 ACCEPTORS = -1
 LEARNERS = -1
@@ -23,21 +34,38 @@ LEARNERS = -1
 DEBUG = False
 
 BACKOFF = False
+BACKOFF_DELAYS = tuple(0.05*x for x in range(20)) # Retry delays in seconds a NACKed proposer picks from at random
+
+# Send each role-wide message (PROPOSAL, ACCEPT, ACCEPT-VALUE, LEARN) as one IP multicast datagram to the role's group
+# rather than one datagram per host. The interface must support multicast, so this is off by default.
+MULTICAST = False
+MULTICAST_GROUPS = {Role.PROPOSER: "239.255.80.1", Role.ACCEPTOR: "239.255.80.2", Role.LEARNER: "239.255.80.3"}
+MULTICAST_INTERFACE = "127.0.0.1" # Every host is on localhost
+
+# Number of sockets bound to a node's port with SO_REUSEPORT, each drained by its own listener thread.
+# The kernel hashes each sender to one socket, so messages from one sender stay in order. Decoding still runs under
+# the GIL, so extra listeners mainly add kernel buffering for bursts; one is the default.
+LISTENERS = 1
+
+# How long, in seconds, a thread may hold the GIL while another waits for it (CPython's default is 0.005).
+# A node hands every message from its listener thread to its queue thread, so a shorter slice hands it over sooner.
+SWITCH_INTERVAL = 0.001
 
-queue_lock = Lock() # Global mutex lock for the listener queue
+scratch = local() # Each sending thread serializes single messages into its own reused buffer
 
 class IConsensusNode(abc.ABC):
     """
     Core Paxos consensus methods
     """
+    __slots__ = () # So that ConsensusNode's slots leave its instances without a __dict__
     @abc.abstractmethod
-    def __init__(self, mode_counts: List[int], hosts: List[List[str]], uid: int) -> None:
+    def __init__(self, mode_counts: tuple[int, int, int], hosts: list[list], uid: int) -> None:
         """
         Called exactly once for a process, at process start.
 
         Parameters:
             mode_counts (tuple[int]): tuple (proposers,acceptors,learners) of the counts for the 3 different modes
-            hosts (List[Lint[int]]): List of lists [hostname, port, consensus or client] for the hosts
+            hosts (list[list]): List of lists [hostname, port, consensus or client] for the hosts
             uid (int): Unique identifier for this host
         """
         raise NotImplementedError
@@ -60,25 +88,59 @@ class ConsensusNode(IConsensusNode):
     Implementation of the IConsensusNode interface.
     Contains core Paxos methods as well as network interface methods.
     """
-    def __init__(self, mode_counts: tuple[int], hosts: List[List[str]], uid: int) -> None:
+    # Every instance attribute; slots make each self.<name> read in the handlers a direct slot access
+    __slots__ = ("hosts", "host_info", "uid", "port", "hostname", "type", "role",
+                 "message_queue", "receiver", "recv_socket", "send_socket", "sendto", "group_addrs",
+                 "con_nodes", "cli_nodes", "con_addrs", "cli_addrs", "host_addrs",
+                 "is_leader", "leader_chosen", "neighbor", "color", "crlistener",
+                 "proposers", "acceptors", "learners", "role_addrs", "seq",
+                 "acceptance_counts", "max_acceptance", "pending_values", "batch_deadline", "max_promise",
+                 "ack_counts", "highest_ack", "min_majority", "accept_sent", "set_sent",
+                 "queue_listener", "group_recv_socket", "listener", "extra_recv_sockets")
+    def __init__(self, mode_counts: tuple[int, int, int], hosts: list[list], uid: int) -> None:
         global PROPOSERS, ACCEPTORS, LEARNERS
         PROPOSERS = mode_counts[0]
         ACCEPTORS = mode_counts[1]
         LEARNERS = mode_counts[2]
-        self.hosts = hosts  # hosts format: [[hostname,port,cli or con],...] where the list is indexed by uid
-        self.host_info = hosts[uid] # host_info is a list [hostname, port, consensus or client]
+        sys.setswitchinterval(SWITCH_INTERVAL) # The process only runs this node, so the setting is the node's
+        self.hosts = make_hosts(hosts)  # Host tuples (hostname, port, cli or con, addr), indexed by uid
+        self.host_info = self.hosts[uid]
         self.uid = uid
-        self.port = int(self.host_info[1])
-        self.hostname = self.host_info[0]
-        self.type = self.host_info[2] # either con for consensus node or cli for client node
-        self.role = "" # To be populated; either PROPOSER, ACCEPTOR, or LEARNER
+        self.port = self.host_info.port
+        self.hostname = self.host_info.hostname
+        self.type = self.host_info.kind # either con for consensus node or cli for client node
+        self.role: Role | None = None # To be populated; either PROPOSER, ACCEPTOR, or LEARNER
         
-        self.message_queue = [] # Network messages go here
-
-        # List of consensus nodes
-        self.con_nodes = list(filter(lambda x: x[2] == "con", self.hosts))
-        # List of client nodes
-        self.cli_nodes = list(filter(lambda x: x[2] == "cli", self.hosts))
+        # Network messages go here; every listener thread (udp_listen and any reuseport_listen) puts and queue_listen
+        # alone gets. A SimpleQueue is safe for multiple producers, so no separate mutex is needed
+        self.message_queue: queue.SimpleQueue[dict] = queue.SimpleQueue()
+        wire.check_fits(sum(mode_counts), BUFFER_SIZE)
+        self.receiver = mmsg.Receiver(BUFFER_SIZE) # Preallocated buffers for udp_listen's batched receives
+        # One socket bound to this node's port receives everything, from leader election on; binding it before the
+        # election starts means no datagram sent to this node is refused while it moves between phases
+        self.recv_socket = self.listen_socket()
+        # Opened in Run; set here so CleanupNode can run on TERM at any point after the queue thread starts
+        self.group_recv_socket: socket | None = None
+        self.extra_recv_sockets: list[socket] = []
+
+        # One send socket shared by every thread for the node's lifetime; each sendto is a single atomic datagram
+        self.send_socket = mmsg.tune_socket(socket(AF_INET, SOCK_DGRAM))
+        self.sendto = self.send_socket.sendto # Bound once, since every single send goes through it
+        if MULTICAST:
+            self.send_socket.setsockopt(IPPROTO_IP, IP_MULTICAST_IF, inet_aton(MULTICAST_INTERFACE))
+            self.send_socket.setsockopt(IPPROTO_IP, IP_MULTICAST_LOOP, 1) # Group members are on this machine
+            group_port = max(host.port for host in self.hosts) + 1 # The port after the hosts' is shared by every group
+            self.group_addrs = {role: (group, group_port) for role, group in MULTICAST_GROUPS.items()}
+
+        # Lists of consensus nodes and client nodes, split in one pass
+        self.con_nodes: list[Host] = []
+        self.cli_nodes: list[Host] = []
+        for host in self.hosts:
+            (self.con_nodes if host.kind == "con" else self.cli_nodes).append(host)
+        # Address tuples for each fixed multicast group, built once
+        self.con_addrs = tuple(host.addr for host in self.con_nodes)
+        self.cli_addrs = tuple(host.addr for host in self.cli_nodes)
+        self.host_addrs = tuple(host.addr for host in self.hosts)
 
         """
         Determine the leader for role election (i.e., the highest UID)
@@ -89,26 +151,34 @@ class ConsensusNode(IConsensusNode):
         
         # Leader election approach - embed a ring topology and complete Chang-Roberts
         self.is_leader = False
-        self.leader_is_chosen = False
+        self.leader_chosen = Event() # Set by the Chang-Roberts listener once the election is over
         self.ChangRoberts()
         
-        while not self.leader_is_chosen:
-            continue
+        self.leader_chosen.wait() # Block, rather than spin, until the election ends
         if DEBUG: print(f"LEADER CONSENSUS: {self.uid},{self.is_leader}")
         
         # List of each role, gets populated later
-        self.proposers = []
-        self.acceptors = []
-        self.learners = []
+        # The leader fills these with UIDs for START; on_start replaces them with the Hosts of each role
+        self.proposers: list = []
+        self.acceptors: list = []
+        self.learners: list = []
+        self.role_addrs = {Role.PROPOSER: (), Role.ACCEPTOR: (), Role.LEARNER: ()} # Address tuples of each role, built when START arrives
 
         # The unique sequence number; increments by len(hosts) each time it is needed to increment
         # This forces disjoint sequence number sets
-        self.seq = self.uid
+        self.seq: int = self.uid
 
-        self.acceptances = [] # Acceptances received
-        self.proposals = [] # Proposals made
-        self.promises = [] # Promises received
-        self.acks = [] # Acks received
+        # Paxos state is kept as running maxima and per-sequence-number counts, so no handler rescans old messages
+        self.acceptance_counts: defaultdict[int, int] = defaultdict(int) # n -> number of acceptances (v,n) received
+        self.max_acceptance: tuple[int, int] | None = None # The (v,n) acceptance with the highest n (the first one received on ties)
+        self.pending_values: list[int] = [] # Forwarded values waiting for the current batch to be proposed
+        self.batch_deadline: float = 0.0 # time.monotonic() by which the pending values are proposed
+        self.max_promise: int = -1 # The highest n promised; sequence numbers are never negative
+        self.ack_counts: defaultdict[int, int] = defaultdict(int) # n -> number of acks received with n as either their n or n'
+        self.highest_ack: tuple[int, int, int | str] | None = None # The ack (n,v,n') with the highest n (the first one received on ties)
+        self.min_majority: int = ACCEPTORS // 2 + 1 # The minimum number of acceptors that constitutes a majority
+        self.accept_sent: set[int] = set() # Sequence numbers this proposer has already sent ACCEPT for
+        self.set_sent: set[int] = set() # Sequence numbers this learner has already announced to the clients
 
 
 
@@ -131,8 +201,8 @@ class ConsensusNode(IConsensusNode):
                 Forward all tokens
         """
         # First send a token to the neighbor
-        neighbor_id = (self.uid+1) % len(self.con_nodes)
-        rec_port = self.hosts[neighbor_id][1] # Neighbor's port
+        # The ring neighbor is fixed, so it is looked up once for both this send and every forward by the listener
+        self.neighbor = self.hosts[(self.uid+1) % len(self.con_nodes)]
         self.color = "RED";
 
         # Start the Chang-Roberts listener thread
@@ -141,60 +211,55 @@ class ConsensusNode(IConsensusNode):
 
         # After a brief wait, forward initial token
         time.sleep(0.1)
-        self.udp_send("TOKEN",self.uid,"localhost",rec_port)
+        self.udp_send_to("TOKEN",self.uid,self.neighbor)
 
     def ChangRobertsListener(self) -> None:
-         with socket(AF_INET, SOCK_DGRAM) as udp_socket:
-            try:
-                udp_socket.bind(("", self.port))
-                while True:
-                    """
-                    Pseudocode for listener thread:
-                    Receive tokens:
-                        If red:
-                            If a lower token is received, ignore and that token gets removed so it quits.
-                            If a higher token is received, set color to black and forward the token
-                            If the same ID token is received, set self to leader, terminate algorithm
-                        If black:
-                            Forward all tokens
-                    """
-                    # Receive and deserialize messages
-                    # Message is a dictionary with keys HEADER, MESSAGE, RECIPIENT, and PORT
-                    message, client_address = udp_socket.recvfrom(BUFFER_SIZE)
-                    message = pickle.loads(message)
-                    
-                    neighbor_id = (self.uid+1) % len(self.con_nodes)
-                    rec_port = self.hosts[neighbor_id][1] # Neighbor's port
-
-                    # Check if a token was received
-                    if message["HEADER"] != "TOKEN":
-                        raise Exception("Non-token sent in Chang-Roberts!",message)
-                    
-                    if message["MESSAGE"] != "TERM": # If not a termination message, follow Chang-Roberts
-                        token = int(message["MESSAGE"])
-                        if self.color == "BLACK": # Always forward
-                            self.udp_send("TOKEN",self.uid,"localhost",rec_port)
-                        else: # Color is red, so compare token
-                            i = self.uid
-                            j = token
-                            if (j < i):
-                                pass # skip, do nothing
-                            if (j > i):
-                                # send j, set color to black
-                                self.color = "BLACK"
-                                self.udp_send("TOKEN",j,"localhost",rec_port)
-                            if (j == i):
-                                time.sleep(0.1)
-                                self.is_leader = True
-                                self.leader_is_chosen = True
-                                self.udp_multicast("TOKEN","TERM",self.con_nodes)
-                                print(f"\n=================================\nNode ID {i} IS THE LEADER")
-                    else: # Message is terminate, so exit ChangRoberts
-                        self.leader_is_chosen = True
-                        return
-
-            finally:
-                udp_socket.close()
+        buffer = memoryview(bytearray(BUFFER_SIZE)) # Every token is received into this one buffer
+        udp_socket = self.recv_socket
+        neighbor = self.neighbor
+        while True:
+            """
+            Pseudocode for listener thread:
+            Receive tokens:
+                If red:
+                    If a lower token is received, ignore and that token gets removed so it quits.
+                    If a higher token is received, set color to black and forward the token
+                    If the same ID token is received, set self to leader, terminate algorithm
+                If black:
+                    Forward all tokens
+            """
+            # Receive into the reused buffer and deserialize messages
+            # Message is a dictionary with keys HEADER, MESSAGE, and SENDERID
+            message = wire.unpack(buffer[:udp_socket.recv_into(buffer)])
+            if message is None: # Not a Paxos message; drop it
+                continue
+
+            # Check if a token was received
+            if message["HEADER"] != "TOKEN":
+                raise Exception("Non-token sent in Chang-Roberts!",message)
+            
+            token = message["MESSAGE"] # Already an int (or "TERM") from the wire decoder
+            if token != "TERM": # If not a termination message, follow Chang-Roberts
+                if self.color == "BLACK": # Always forward the token as received
+                    self.udp_send_to("TOKEN",token,neighbor)
+                else: # Color is red, so compare token
+                    i = self.uid
+                    j = token
+                    if (j > i):
+                        # send j, set color to black
+                        self.color = "BLACK"
+                        self.udp_send_to("TOKEN",j,neighbor)
+                    elif (j == i):
+                        time.sleep(0.1)
+                        self.is_leader = True
+                        self.leader_chosen.set()
+                        self.udp_multicast("TOKEN","TERM",self.con_addrs)
+                        print(f"\n=================================\nNode ID {i} IS THE LEADER")
+                    # Otherwise j < i: the lower token is dropped, so it never goes around the ring
+            else: # Message is terminate, so exit ChangRoberts
+                self.leader_chosen.set()
+                return
+
 
     def InitializeNode(self) -> None:
         global PROPOSERS, ACCEPTORS, LEARNERS
@@ -207,42 +272,32 @@ class ConsensusNode(IConsensusNode):
             time.sleep(0.05) # Wait for other nodes to initialize
             
             idx = 0
-            # Recall self.hosts[idx][0] is the hostname of the idxth host, 1 is the port
-            for i in range(PROPOSERS):
-                self.udp_send("ROLE","PROPOSER",self.hosts[idx][0],self.hosts[idx][1])
-                self.proposers.append(idx)
-                idx += 1
-            for i in range(ACCEPTORS):
-                self.udp_send("ROLE","ACCEPTOR",self.hosts[idx][0],self.hosts[idx][1])
-                self.acceptors.append(idx)
-                idx += 1
-            for i in range(LEARNERS):
-                self.udp_send("ROLE","LEARNER",self.hosts[idx][0],self.hosts[idx][1])
-                self.learners.append(idx)
-                idx += 1
+            for role, count, members in ((Role.PROPOSER, PROPOSERS, self.proposers),
+                                         (Role.ACCEPTOR, ACCEPTORS, self.acceptors),
+                                         (Role.LEARNER, LEARNERS, self.learners)):
+                members.extend(range(idx, idx + count))
+                idx += count
+                # Each role's assignment is serialized once and sent to all of its hosts together
+                self.udp_multicast("ROLE",role,tuple(self.hosts[i].addr for i in members))
             # By this setup, the n-1st node is always a learner (message above gets lost, but that is OK and the idx append is still needed)
-            self.role = "LEARNER"
+            self.role = Role.LEARNER
 
             # After a brief wait to get everyone else situated, we allow the initialization to end
             time.sleep(0.1) 
             if DEBUG: print("NOTIFYING CLIENT NODE TO BEGIN PROPOSALS")
             
         else: # If not the last node, then wait to learn role
-            with socket(AF_INET, SOCK_DGRAM) as udp_socket:
-                try:
-                    udp_socket.bind(("", self.port))
-                    while True:
-                        # Receive and deserialize messages
-                        # Message is a dictionary with keys HEADER, MESSAGE, RECIPIENT, and PORT
-                        message, client_address = udp_socket.recvfrom(BUFFER_SIZE)
-                        message = pickle.loads(message)
-                        if message["HEADER"] != "ROLE": # Might be a leftover message from leader election
-                            continue
-                        else:
-                            self.role = message["MESSAGE"]
-                            return
-                finally:
-                    udp_socket.close()
+            buffer = memoryview(bytearray(BUFFER_SIZE)) # Every message is received into this one buffer
+            udp_socket = self.recv_socket
+            while True:
+                # Receive into the reused buffer and deserialize messages
+                # Message is a dictionary with keys HEADER, MESSAGE, and SENDERID
+                message = wire.unpack(buffer[:udp_socket.recv_into(buffer)])
+                if message is None or message["HEADER"] != "ROLE": # Might be noise or a leftover message from leader election
+                    continue
+                else:
+                    self.role = message["MESSAGE"]
+                    return
             
 
     def Run(self) -> None:
@@ -253,307 +308,423 @@ class ConsensusNode(IConsensusNode):
         self.queue_listener = Thread(target=self.queue_listen, name=f"queue_listener{self.uid}:{self.port}")
         self.queue_listener.start()
 
+        # With multicast, the listener also receives on this role's group; it is joined here, before the leader sends START
+        if MULTICAST:
+            assert self.role is not None # InitializeNode assigns the role before Run
+            self.group_recv_socket = self.group_socket(self.role)
+
         # For all hosts, set up a listener thread
         self.listener = Thread(target=self.udp_listen, name=f"listener{self.uid}:{self.port}")
         self.listener.start()
+        # Any further listeners share the port with recv_socket
+        self.extra_recv_sockets = [self.listen_socket() for _ in range(LISTENERS - 1)]
+        for i, udp_socket in enumerate(self.extra_recv_sockets, 1):
+            Thread(target=self.reuseport_listen, args=(udp_socket,), name=f"listener{self.uid}:{self.port}.{i}").start()
 
         # The leader should notify the clients and consensus nodes of the role assignments (after a brief delay)
         if (self.is_leader):
-            self.udp_multicast("START",(self.proposers,self.acceptors,self.learners),self.hosts)
+            self.udp_multicast("START",(self.proposers,self.acceptors,self.learners),self.host_addrs)
         
 
     def CleanupNode(self) -> None:
-        # No need to implement this for basic Paxos; may be implemented in the future
-        pass
+        # Release the sockets held for the node's lifetime
+        self.send_socket.close()
+        self.recv_socket.close()
+        if self.group_recv_socket is not None:
+            self.group_recv_socket.close()
+        for udp_socket in self.extra_recv_sockets:
+            udp_socket.close()
 
 
     def queue_listen(self) -> None:
         """
         Listen for and handle updates to the request queue.
 
-        This function handles the majority of the Paxos logic.
+        Each message is handed to the handler for its header; the handlers contain the majority of the Paxos logic.
         """
+        dispatch = self.dispatch_table()
+        get = self.message_queue.get
         while True:
-            if len(self.message_queue) > 0:
-                # First receive any messages in the queue that need to be handled
-                queue_lock.acquire()
+            # Block until the listener queues a message; no spinning while idle
+            # While a batch of forwarded values is pending, wait no later than its deadline
+            if self.pending_values:
                 try:
-                    message = self.message_queue.pop(0)
-                finally: 
-                    queue_lock.release()
-
-                # The leader sends all role assignments in a START message
-                # Each node keeps a local copy of this
-                # After receipt of this message, other messages may be completed
-                if message["HEADER"] == "START":
-                    roles_tuple = message["MESSAGE"]
-                    self.proposers = [self.hosts[i] for i in roles_tuple[0]]
-                    self.acceptors = [self.hosts[i] for i in roles_tuple[1]]
-                    self.learners = [self.hosts[i] for i in roles_tuple[2]]
-
-
-                # Check if a terminate message is sent
-                if message["HEADER"] == "TERM":
-                    os._exit(0) # Exit program and all threads
-
-
-                # Check if a message is being forwarded from a client
-                # This will initiate Paxos phase 1.1
-                if message["HEADER"] == "FWD":
-                    if self.role != "PROPOSER":
-                        raise Exception(f"Message sent to incorrect recipient: {message}")
-                    """
-                    Pseudocode: Send the proposal (v,n) to each acceptor.
-                    """
-                    VAL = message["MESSAGE"]
-                    if DEBUG: print(f"Forwarded value received by {self.role} (ID {self.uid}): {VAL}. Beginning Phase 1.1 at seq {self.seq}...\n")
-                    msg = (VAL,self.seq)
-                    self.udp_multicast("PROPOSAL",msg,self.acceptors)
-                    # Increase the sequence number for future messages
-                    # Increasing by len(hosts) keeps sequence numbers disjoint
-                    self.seq += len(self.hosts)
-                    
-                
-
-                if message["HEADER"] == "PROPOSAL":
-                    if self.role != "ACCEPTOR":
-                        raise Exception(f"Message sent to incorrect recipient: {message}")
-                    """
-                    The receipt of this message initiates Paxos phase 1.2
-                    A message (v,n) w/ message v and sequence number n is received.
-                    Pseudocode:
-                    Store all sent promises in a promise list.
-                    If n is the largest proposal received, send a promise: ack(n,_,_)
-                        and ignore proposals labeled less than n
-                    If an ACCEPTOR has ACCEPTED a proposal w/ number n' < n, send a promise: ack(n,v1,n')
-                        this tells the proposer to send ACCEPT messages w/ value v1 rather than v
-                        (alternatively, a nack can be sent)
-                    """
-
-                    """
-                    #######################
-                    # TODO: ADD FAILURE TESTS HERE
-                    # Change these UIDs to any value
-                    if self.uid == 5 or self.uid == 6: 
-                        os._exit(0)
-                    #######################
-                    """
-
-                    # Decode the proposal as a tuple (v,n)
-                    (v,n) = message["MESSAGE"]
-                    if DEBUG: print(f"An {self.role} (ID {self.uid}) received {v} @ seq {n}")
-                    
-                    # Check if n is the largest sequence number received
-                    # The list copy is done for safety purposes
-                    temp = self.promises.copy()
-                    temp.append((v,n))
-                    greater_proposals = list(filter(lambda x: x[1] > n, temp))
-                    
-                    if len(greater_proposals) == 0: # There is no greater proposal, so make a promise
-                        # Two cases:
-                        # (1) No accepted value has been seen yet -> send ack(n,v,_)
-                        # (2) An accepted value at n1 < n has been seen -> send ack(n,v,n1)
-                        rec_port = self.hosts[message["SENDERID"]][1]
-                        if self.acceptances:
-                            # If there are accepted values, need to find the highest sequence number
-                            # and send the value associated with it
-                            max_tuple = self.acceptances[0]
-                            for t in self.acceptances:
-                                if t[1] > max_tuple[1]:
-                                    max_tuple = t
-                            ack = (n,max_tuple[0],max_tuple[1]) # Discard old values, replace w/ already accepted values
-                            self.promises.append((max_tuple[0],max_tuple[1]))
-                            # Note that (max_tuple[0],max_tuple[1]) corresponds to (vx,nx) of the highest nx accepted
-                            if DEBUG: print("SENDING (n,v,n') ACK")
-                            self.udp_send("ACK",ack,"localhost",rec_port)
-                        else:    
-                            # No accepted values, so just ack the n and v we were sent
-                            ack = (n,v,"_")
-                            self.promises.append((v,n))
-                            if DEBUG: print("SENDING (n,v,_) ACK")
-                            self.udp_send("ACK",ack,"localhost",rec_port)
-                    else: # There was a greater proposal - send a NACK
-                        if DEBUG: self.udp_send("NACK",(v,n),"localhost",rec_port)
-                
-
-                if message["HEADER"] == "NACK":
-                    if self.role != "PROPOSER":
-                        raise Exception(f"Message sent to incorrect recipient: {message}")
-                    # Backoff can be unpredictably very inefficienct; it is not recommended
-                    # The use of NACKs generally avoids race conditions so backoff is not required
-                    if BACKOFF:
-                        (v,n) = message["MESSAGE"]
-                        # Send a message to self to "reforward" from client (retry)
-                        time.sleep(random.choice([0.05*x for x in range(20)])) # Wait a small random amount of time
-                        self.udp_send("FWD",v,"localhost",self.port) # self on self.port since we are sending to self
-
-
-                if message["HEADER"] == "ACK":
-                    if self.role != "PROPOSER":
-                        raise Exception(f"Message sent to incorrect recipient: {message}")
-                    """
-                    The recipient of this message initiates (or continues) Paxos phase 2.1
-                    An ack(n,v,n') is received from an acceptor and this determines the contents of the proposer's ACCEPT message.
-                    Pseudocode:
-                    Store ack(_,_,_) in an ack list.
-                    Check if attached timestamp n forms a majority. If majority:
-                        Send ACCEPT(v,n) where v is the value of the highest n ack received
-
-                        If ack(n,v,_) is received then send ACCEPT(v,n)
-                        If ack(n,v',n') is received at any time (meaning a value was accepted already)
-                            override v to use v', and send ACCEPT(v',N), where N is the HIGHEST sequence number seen
-                    """
-                    (n1,v,n2) = message["MESSAGE"]
-                    if DEBUG: print(f"Ack received at {self.role} {self.uid}: {(n1,v,n2)} with acceptances list {self.acceptances}")
-                    # Important note: If acceptances not counted in phase 1 are found here, they still need to be accounted for
-                    # This can be done with "ghost" messages
-                    
-                    min_majority = math.floor(len(self.acceptors)/2) + 1 # The minimum number of acceptors that constitutes a majority
-                    
-                    self.acks.append((n1,v,n2))
-
-                    # Check if majority has been received for n1 being sent in
-                    n1_ack_list = list(filter(lambda x: (x[0]==n1 or x[2]==n1), self.acks))
-                    
-                    if len(n1_ack_list) >= min_majority:
-                        if DEBUG: print("MAJORITY ACHIEVED BY PROPOSER - SENDING ACCEPT REQUEST TO ALL ACCEPTORS")
-                        # The accept message is (v,n)
-                        # Here v is the value of the highest-numbered proposal
-                        # n is n1
-
-                        # Find highest n ack received
-                        # Note that ack[2] is always less than or equal to ack[0], so only check ack[0]
-                        highest_ack = self.acks[0]
-                        for ack in self.acks:
-                            if ack[0] > highest_ack[0]:
-                                highest_ack = ack
-
-                        # If there are accepted values, need to find the highest sequence number (ghost messages)
-                        # and send the value associated with it
-                        max_tuple = tuple()
-                        if self.acceptances:
-                            
-                            max_tuple = self.acceptances[0]
-                            for t in self.acceptances:
-                                if t[1] > max_tuple[1]:
-                                    max_tuple = t # (v,n) that must be sent
-                            accept_req = max_tuple
-                            if DEBUG: print("PROPOSAL OVERRULED BY ALREADY ACCEPTED MESSAGE",accept_req)
-                            self.udp_multicast("ACCEPT",accept_req,self.acceptors)
-                        else:
-                            accept_req = (highest_ack[1],n1)
-                            self.udp_multicast("ACCEPT",accept_req,self.acceptors)
-                    
-                    
-                
-                if message["HEADER"] == "ACCEPT":
-                    if self.role != "ACCEPTOR":
-                        raise Exception(f"Message sent to incorrect recipient: {message}")
-                    """
-                    The recipient of this message initiates Paxos phase 2.2
-                    An ACCEPT(v,n) is accepted unless there is a promise to a sequence number greater than n.
-                    Pseudocode:
-                    If ack(n,_,_) or ack(_,_,n) found in promise list, ignore.
-                    Else accept v and n, and add to the accept list.
-                    Forward values to learner
-                    """
-
-                    # Reminder - proposals and accept requests are (v,n), acks are (n1,v,n2) format
-                    if DEBUG: print(f"Accept request received by a {self.role} (ID {self.uid}): {message}")
-                    (v,n) = message["MESSAGE"]
-                    # Check if a promise has (v1,n1), where n1 < n (don't accept in this case)
-                    greater_promises = list(filter(lambda x: x[1] > n, self.promises))
-                    if len(greater_promises) == 0:
-                        # Send to the learner since no greater promises were made
-                        self.udp_multicast("ACCEPT-VALUE",(v,n),self.proposers)
-                        self.udp_multicast("LEARN",(v,n),self.learners) 
-                        if DEBUG: print(f"{(v,n)} HAS BEEN ACCEPTED",self.learners)
-                    else:
-                        if DEBUG: print(f"Accept request rejected {self.role} (ID {self.uid}): {message}")
-
-
-                if message["HEADER"] == "LEARN":
-                    if self.role != "LEARNER":
-                        raise Exception(f"Message sent to incorrect recipient: {message}")
-                    """
-                    The recipient of this message initiates (or continues) Paxos phase 3.
-                    It collects accepted values and decides on a majority.
-                    Pseudocode:
-                    On receipt of (v,n), add the accepted value to a list of accepted values
-                    If the list reaches a majority, multicast to clients
-                    """
-                    if DEBUG: print(f"Accepted value received: {message['MESSAGE']}")
-                    (v,n) = message["MESSAGE"]
-                    self.acceptances.append((v,n))
-                    min_majority = math.floor(len(self.acceptors)/2) + 1 # The minimum number of acceptors that constitutes a majority
-                    # Check if majority has been received for n1
-                    acceptance_list = list(filter(lambda x: (x[1]==n), self.acceptances))
-                    if DEBUG: print("Acceptances and minimum majority:",len(acceptance_list),min_majority)
-                    if len(acceptance_list) >= min_majority:
-                        if DEBUG: print("MAJORITY ACHIEVED BY ACCEPTORS.")
-                        self.udp_multicast("SET",v,self.cli_nodes)
-                    
+                    message = get(timeout=max(0.0, self.batch_deadline - time.monotonic()))
+                except queue.Empty:
+                    self.propose_pending()
+                    continue
+            else:
+                message = get()
+
+            handler = dispatch.get(message["HEADER"])
+            if handler is not None:
+                handler(message)
+            elif DEBUG: print(f"Message sent to incorrect recipient: {message}")
+
+            # A busy queue never times out above, so the batch deadline is also checked after every message
+            if self.pending_values and time.monotonic() >= self.batch_deadline:
+                self.propose_pending()
+
+
+    def on_start(self, message: dict) -> None:
+        """
+        The leader sends all role assignments in a START message
+        Each node keeps a local copy of this
+        After receipt of this message, other messages may be completed
+        """
+        roles_tuple = message["MESSAGE"]
+        self.proposers = [self.hosts[i] for i in roles_tuple[0]]
+        self.acceptors = [self.hosts[i] for i in roles_tuple[1]]
+        self.learners = [self.hosts[i] for i in roles_tuple[2]]
+        self.min_majority = len(self.acceptors) // 2 + 1
+        for role, group in ((Role.PROPOSER, self.proposers), (Role.ACCEPTOR, self.acceptors), (Role.LEARNER, self.learners)):
+            self.role_addrs[role] = tuple(host.addr for host in group)
+
+
+    def on_term(self, message: dict) -> None:
+        """
+        A client has signalled shutdown.
+        """
+        self.CleanupNode()
+        os._exit(0) # Exit program and all threads
+
+
+    def on_fwd(self, message: dict) -> None:
+        """
+        A message is being forwarded from a client; this initiates Paxos phase 1.1
+        Forwarded values are batched, so values arriving together are proposed in one round rather than
+        each starting a round that would override the last.
+        """
+        if not self.pending_values:
+            self.batch_deadline = time.monotonic() + BATCH_WINDOW
+        self.pending_values.append(message["MESSAGE"])
+        if len(self.pending_values) >= BATCH_SIZE or time.monotonic() >= self.batch_deadline:
+            self.propose_pending()
+
+
+    def propose_pending(self) -> None:
+        """
+        Pseudocode: Send the proposal (v,n) to each acceptor.
+        Only one value can be chosen, so the batch proposes its first value; every client learns the chosen value.
+        """
+        VAL = self.pending_values[0]
+        if DEBUG: print(f"Forwarded values received by {self.role} (ID {self.uid}): {self.pending_values}. Beginning Phase 1.1 with {VAL} at seq {self.seq}...\n")
+        self.pending_values.clear() # The list is reused for the next batch
+        msg = (VAL,self.seq)
+        self.role_multicast("PROPOSAL",msg,Role.ACCEPTOR)
+        # Increase the sequence number for future messages
+        # Increasing by len(hosts) keeps sequence numbers disjoint
+        self.seq += len(self.hosts)
+
+
+    def on_proposal(self, message: dict) -> None:
+        """
+        The receipt of this message initiates Paxos phase 1.2
+        A message (v,n) w/ message v and sequence number n is received.
+        Pseudocode:
+        Track the highest promise sent.
+        If n is the largest proposal received, send a promise: ack(n,_,_)
+            and ignore proposals labeled less than n
+        If an ACCEPTOR has ACCEPTED a proposal w/ number n' < n, send a promise: ack(n,v1,n')
+            this tells the proposer to send ACCEPT messages w/ value v1 rather than v
+            (alternatively, a nack can be sent)
+        """
+
+        """
+        #######################
+        # TODO: ADD FAILURE TESTS HERE
+        # Change these UIDs to any value
+        if self.uid == 5 or self.uid == 6: 
+            os._exit(0)
+        #######################
+        """
+
+        # Decode the proposal as a tuple (v,n)
+        (v,n) = message["MESSAGE"]
+        sender = self.hosts[message["SENDERID"]]
+        ack: tuple[int, int, int | str]
+        if DEBUG: print(f"An {self.role} (ID {self.uid}) received {v} @ seq {n}")
+        
+        # Check if n is the largest sequence number received
+        if self.max_promise <= n: # There is no greater proposal, so make a promise
+            # Two cases:
+            # (1) No accepted value has been seen yet -> send ack(n,v,_)
+            # (2) An accepted value at n1 < n has been seen -> send ack(n,v,n1)
+            max_tuple = self.max_acceptance
+            if max_tuple is not None:
+                # If there are accepted values, send the value with the highest sequence number
+                ack = (n,max_tuple[0],max_tuple[1]) # Discard old values, replace w/ already accepted values
+                self.promise(max_tuple[1])
+                # Note that (max_tuple[0],max_tuple[1]) corresponds to (vx,nx) of the highest nx accepted
+                if DEBUG: print("SENDING (n,v,n') ACK")
+                self.udp_send_to("ACK",ack,sender)
+            else:    
+                # No accepted values, so just ack the n and v we were sent
+                ack = (n,v,"_")
+                self.promise(n)
+                if DEBUG: print("SENDING (n,v,_) ACK")
+                self.udp_send_to("ACK",ack,sender)
+        else: # There was a greater proposal - send a NACK
+            if DEBUG: self.udp_send_to("NACK",(v,n),sender)
+
+
+    def on_nack(self, message: dict) -> None:
+        """
+        A proposal was rejected; retries after a backoff if BACKOFF is set.
+        """
+        # Backoff can be unpredictably very inefficienct; it is not recommended
+        # The use of NACKs generally avoids race conditions so backoff is not required
+        if BACKOFF:
+            (v,n) = message["MESSAGE"]
+            # Send a message to self to "reforward" from client (retry)
+            time.sleep(random.choice(BACKOFF_DELAYS)) # Wait a small random amount of time
+            self.udp_send_to("FWD",v,self.host_info) # Sending to self
+
+
+    def on_ack(self, message: dict) -> None:
+        """
+        The recipient of this message initiates (or continues) Paxos phase 2.1
+        An ack(n,v,n') is received from an acceptor and this determines the contents of the proposer's ACCEPT message.
+        Pseudocode:
+        Store ack(_,_,_) in an ack list.
+        Check if attached timestamp n forms a majority. If majority:
+            Send ACCEPT(v,n) where v is the value of the highest n ack received
+
+            If ack(n,v,_) is received then send ACCEPT(v,n)
+            If ack(n,v',n') is received at any time (meaning a value was accepted already)
+                override v to use v', and send ACCEPT(v',N), where N is the HIGHEST sequence number seen
+        """
+        (n1,v,n2) = message["MESSAGE"]
+        if DEBUG: print(f"Ack received at {self.role} {self.uid}: {(n1,v,n2)} with highest acceptance {self.max_acceptance}")
+        # Important note: If acceptances not counted in phase 1 are found here, they still need to be accounted for
+        # This can be done with "ghost" messages
+        
+        # Count the ack once for n1, and once for n2 if it names a different sequence number
+        acks = self.ack_counts[n1] + 1
+        self.ack_counts[n1] = acks
+        if n2 != n1 and n2 != "_":
+            self.ack_counts[n2] += 1
+        # Note that ack[2] is always less than or equal to ack[0], so only check ack[0]
+        if self.highest_ack is None or n1 > self.highest_ack[0]:
+            self.highest_ack = (n1,v,n2)
+
+        # Check if majority has been received for n1 being sent in
+        if acks >= self.min_majority and n1 not in self.accept_sent: # Acks past the majority do not resend ACCEPT
+            self.accept_sent.add(n1)
+            if DEBUG: print("MAJORITY ACHIEVED BY PROPOSER - SENDING ACCEPT REQUEST TO ALL ACCEPTORS")
+            # The accept message is (v,n)
+            # Here v is the value of the highest-numbered proposal
+            # n is n1
+
+            # If there are accepted values, send the value with the highest sequence number (ghost messages)
+            accept_req = self.max_acceptance # (v,n) that must be sent, if any value was accepted
+            if accept_req is not None:
+                if DEBUG: print("PROPOSAL OVERRULED BY ALREADY ACCEPTED MESSAGE",accept_req)
+                self.role_multicast("ACCEPT",accept_req,Role.ACCEPTOR)
+            else:
+                accept_req = (self.highest_ack[1],n1)
+                self.role_multicast("ACCEPT",accept_req,Role.ACCEPTOR)
+
+
+    def on_accept(self, message: dict) -> None:
+        """
+        The recipient of this message initiates Paxos phase 2.2
+        An ACCEPT(v,n) is accepted unless there is a promise to a sequence number greater than n.
+        Pseudocode:
+        If ack(n,_,_) or ack(_,_,n) found in promise list, ignore.
+        Else accept v and n, and add to the accept list.
+        Forward values to learner
+        """
+
+        # Reminder - proposals and accept requests are (v,n), acks are (n1,v,n2) format
+        if DEBUG: print(f"Accept request received by a {self.role} (ID {self.uid}): {message}")
+        (v,n) = message["MESSAGE"]
+        # Check if a promise has (v1,n1), where n1 < n (don't accept in this case)
+        if self.max_promise <= n:
+            # Send to the learner since no greater promises were made
+            self.role_multicast("ACCEPT-VALUE",(v,n),Role.PROPOSER)
+            self.role_multicast("LEARN",(v,n),Role.LEARNER) 
+            if DEBUG: print(f"{(v,n)} HAS BEEN ACCEPTED",self.learners)
+        else:
+            if DEBUG: print(f"Accept request rejected {self.role} (ID {self.uid}): {message}")
+
+
+    def on_accept_value(self, message: dict) -> None:
+        """
+        An acceptor has accepted (v,n); the proposer records it and forwards it to the learners.
+        """
+        if DEBUG: print(f"Proposer received notice of accepted value: (ID {self.uid}) received {message}")
+        (v,n) = message["MESSAGE"]
+        self.record_acceptance(v,n)
+        # Forward to learner (this is added redundancy due to possible network/concurrency failure, see documentation)
+        self.role_multicast("LEARN",(v,n),Role.LEARNER)
+
+
+    def on_learn(self, message: dict) -> None:
+        """
+        The recipient of this message initiates (or continues) Paxos phase 3.
+        It collects accepted values and decides on a majority.
+        Pseudocode:
+        On receipt of (v,n), add the accepted value to a list of accepted values
+        If the list reaches a majority, multicast to clients
+        """
+        if DEBUG: print(f"Accepted value received: {message['MESSAGE']}")
+        (v,n) = message["MESSAGE"]
+        acceptances = self.record_acceptance(v,n)
+        # Check if majority has been received for n
+        if DEBUG: print("Acceptances and minimum majority:",acceptances,self.min_majority)
+        if acceptances >= self.min_majority and n not in self.set_sent: # Clients are told each decision once
+            self.set_sent.add(n)
+            if DEBUG: print("MAJORITY ACHIEVED BY ACCEPTORS.")
+            self.udp_multicast("SET",v,self.cli_addrs)
+
+
+    def dispatch_table(self) -> dict[str, Callable[[dict], None]]:
+        """
+        Maps each header this node's role handles to its handler. Headers meant for other roles are not in the table,
+        so a misrouted message is dropped with one dict lookup.
+        """
+        dispatch: dict[str, Callable[[dict], None]] = {"START": self.on_start, "TERM": self.on_term}
+        if self.role is Role.PROPOSER:
+            dispatch.update({"FWD": self.on_fwd, "NACK": self.on_nack, "ACK": self.on_ack, "ACCEPT-VALUE": self.on_accept_value})
+        elif self.role is Role.ACCEPTOR:
+            dispatch.update({"PROPOSAL": self.on_proposal, "ACCEPT": self.on_accept})
+        elif self.role is Role.LEARNER:
+            dispatch["LEARN"] = self.on_learn
+        return dispatch
+
+
+    def promise(self, n: int) -> None:
+        """
+        Records a promise made for sequence number n.
+        """
+        if n > self.max_promise:
+            self.max_promise = n
+
+
+    def record_acceptance(self, v: int, n: int) -> int:
+        """
+        Records an accepted value (v,n) in the acceptance counts and the running maximum.
+        Returns the number of acceptances now recorded for n.
+        """
+        count = self.acceptance_counts[n] + 1
+        self.acceptance_counts[n] = count
+        if self.max_acceptance is None or n > self.max_acceptance[1]:
+            self.max_acceptance = (v,n)
+        return count
+
 
     """
     Network interface methods
     """
-    def udp_multicast(self, header: str, message: str, group: List[List[str]]) -> None:
-        # group is a list of hosts (lists) [[hostname,port,type],...]
-        for rec in group:
-            self.udp_send(header, message, rec[0], int(rec[1]))
+    def udp_multicast(self, header: str, message, addrs: tuple[tuple[str, int], ...]) -> None:
+        # addrs is one of the prebuilt address tuples, e.g. self.cli_addrs
+        # Serialize once, then send to every address with as few sendmmsg calls as possible
+        message = wire.pack(header, message, self.uid)
+        mmsg.sendmmsg_to(self.send_socket, message, addrs)
+
+
+    def role_multicast(self, header: str, message, role: Role) -> None:
+        """
+        Sends a message to every node with the given role.
+        With MULTICAST this is one datagram to the role's group; otherwise it is one datagram per host with the role.
+
+        Parameters:
+            header (str): The header that defines the message type
+            message: The message body
+            role (Role): PROPOSER, ACCEPTOR, or LEARNER
+        """
+        if MULTICAST:
+            self.sendto(wire.pack(header, message, self.uid), self.group_addrs[role])
+        else:
+            self.udp_multicast(header, message, self.role_addrs[role])
 
 
-    def udp_send(self, header: str, message, recipient: str, port: int) -> None:
+    def udp_send_to(self, header: str, message, host: Host) -> None:
         """
         All outgoing messages are sent through this handler.
 
         Parameters:
             header (str): The header that defines the message type
             message (str): The raw string message to send
-            recipient (str): The hostname of the recipient
-            port (int): The port of the recipient 
-        """
-        # Define and serialize the message to byte form before sending
-        message =   {
-                        'HEADER': header,
-                        'MESSAGE': message,
-                        'RECIPIENT': recipient,
-                        'PORT': int(port),
-                        'SENDERID': int(self.uid)
-                    }
-        message = pickle.dumps(message)
+            host (Host): The recipient; its addr tuple is used as is
+        """
+        # Serialize the message into this thread's scratch buffer before sending
+        buffer = getattr(scratch, "buffer", None)
+        if buffer is None:
+            buffer = scratch.buffer = memoryview(bytearray(BUFFER_SIZE))
+        size = wire.pack_into(buffer, header, message, self.uid)
         
         # Send the message over UDP
-        with socket(AF_INET, SOCK_DGRAM) as udp_socket:
-            udp_socket.sendto(message, (recipient, int(port)))
+        self.sendto(buffer[:size], host.addr)
+    
+
+    def listen_socket(self) -> socket:
+        """
+        Opens a socket bound to this node's port, with a receive buffer large enough for bursts.
+        """
+        return mmsg.tune_socket(socket(AF_INET, SOCK_DGRAM), ("", self.port))
     
 
+    def group_socket(self, role: Role) -> socket:
+        """
+        Opens a socket that has joined the multicast group of the given role (this node's).
+        """
+        group, group_port = self.group_addrs[role]
+        # Every member of every group shares the port; bound to the group address, so other groups' traffic is not received
+        udp_socket = mmsg.tune_socket(socket(AF_INET, SOCK_DGRAM), (group, group_port))
+        udp_socket.setsockopt(IPPROTO_IP, IP_ADD_MEMBERSHIP, inet_aton(group) + inet_aton(MULTICAST_INTERFACE))
+        return udp_socket
+
+
     def udp_listen(self) -> None:
         """
         Listen for incoming UDP messages, deserialize, and handle.
+        With MULTICAST, the role's group socket is served by this same thread.
         """
-        with socket(AF_INET, SOCK_DGRAM) as udp_socket:
-            try:
-                udp_socket.bind(("", self.port))
+        # The sockets live as long as the node and are closed by CleanupNode
+        udp_socket = self.recv_socket
+        try:
+            if self.group_recv_socket is None:
                 while True:
-                    # Receive and deserialize messages
-                    # Message is a dictionary with keys HEADER, MESSAGE, RECIPIENT, and PORT
-                    message, client_address = udp_socket.recvfrom(BUFFER_SIZE)
-                    message = pickle.loads(message)
-
-                    # If a proposer is receiving accept messages, bypass queue
-                    if message["HEADER"] == "ACCEPT-VALUE":
-                        if DEBUG: print(f"Proposer received notice of accepted value: (ID {self.uid}) received {message}")
-                        (v,n) = message["MESSAGE"]
-                        self.acceptances.append((v,n))
-                        # Forward to learner (this is added redundancy due to possible network/concurrency failure, see documentation)
-                        self.udp_multicast("LEARN",(v,n),self.learners)
-
-                    else: # Else add to the message queue
-                        queue_lock.acquire()
-                        try:
-                            self.message_queue.append(message)
-                        finally: 
-                            queue_lock.release()
-            finally:
-                udp_socket.close()
\ No newline at end of file
+                    self.receive(udp_socket, self.receiver)
+            # Wait on both sockets at once; each wake drains whichever sockets are ready
+            with selectors.DefaultSelector() as selector:
+                # Each registration carries the socket with its receive buffers
+                selector.register(udp_socket, selectors.EVENT_READ, (udp_socket, self.receiver))
+                group_socket = self.group_recv_socket
+                selector.register(group_socket, selectors.EVENT_READ, (group_socket, mmsg.Receiver(BUFFER_SIZE)))
+                while True:
+                    for key, _ in selector.select():
+                        self.receive(*key.data)
+        except OSError:
+            if udp_socket.fileno() != -1: # Only a socket closed by CleanupNode on TERM ends the listener quietly
+                raise
+
+
+    def reuseport_listen(self, udp_socket: socket) -> None:
+        """
+        Listen on one of the extra sockets sharing this node's port, with its own receive buffers.
+        """
+        receiver = mmsg.Receiver(BUFFER_SIZE)
+        try:
+            while True:
+                self.receive(udp_socket, receiver)
+        except OSError:
+            if udp_socket.fileno() != -1: # Only a socket closed by CleanupNode on TERM ends the listener quietly
+                raise
+
+
+    def receive(self, udp_socket: socket, receiver: mmsg.Receiver) -> None:
+        """
+        Waits for datagrams on udp_socket and drains everything queued on it into the message queue.
+        """
+        unpack = wire.unpack
+        put = self.message_queue.put
+        # Receive batches into the preallocated buffers and deserialize each message
+        # Message is a dictionary with keys HEADER, MESSAGE, and SENDERID; it holds no reference to the buffers
+        for batch in receiver.drain(udp_socket):
+            for message in batch:
+                message = unpack(message)
+                if message is not None: # Anything else is not a Paxos message; drop it
+                    put(message)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Loads the hosts.txt file shared by the client and consensus driver files.
+
+The file starts with the PROPOSERS, ACCEPTORS, and LEARNERS counts, followed by one
+"hostname port con|cli" line per host, indexed by UID.
+"""
+from __future__ import annotations
+from collections import namedtuple
+from socket import gethostbyname
+
+HOSTS_FILE = "./hosts.txt"
+
+# One host as the node classes use it; addr is the (IP address, port) tuple sends go to, resolved once
+Host = namedtuple("Host", "hostname port kind addr")
+
+
+def make_hosts(rows: list[list]) -> list[Host]:
+    """
+    Converts [hostname, port, consensus or client] rows into Host tuples, indexed by UID like the rows.
+    Each hostname is resolved once here, so sending to a Host's addr never needs a name lookup.
+    """
+    addresses: dict[str, str] = {} # hostname -> IP address; every host is usually "localhost"
+    hosts = []
+    for name, port, kind in rows:
+        address = addresses.get(name)
+        if address is None:
+            address = addresses[name] = gethostbyname(name)
+        hosts.append(Host(name, int(port), kind, (address, int(port))))
+    return hosts
+
+
+def load_hosts(path: str = HOSTS_FILE) -> tuple[tuple[int, int, int], list[list]]:
+    """
+    Parses the hosts file at path.
+    Returns the (proposers,acceptors,learners) counts and the hosts as lists [hostname, port, consensus or client],
+    indexed by UID, as the node classes expect.
+    """
+    with open(path,"r") as f:
+        data = f.read().splitlines()
+    proposers, acceptors, learners = (int(line.split()[1]) for line in data[:3])
+    rows = []
+    for line in data[3:]:
+        if not line.strip():
+            continue
+        name, port, kind = line.split()
+        rows.append([name, int(port), kind])
+    return (proposers,acceptors,learners), rows
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batched UDP receive and send through Linux's recvmmsg(2) and sendmmsg(2).
+
+Python's socket module does not expose these calls, so they are bound through ctypes.
+On platforms without them, both helpers fall back to one recv_into/sendto per datagram.
+tune_socket applies the socket options every node and client socket shares.
+"""
+from __future__ import annotations
+import ctypes
+import os
+import sys
+from socket import socket, AF_INET, MSG_DONTWAIT, SOL_SOCKET, SO_REUSEADDR, SO_REUSEPORT, SO_RCVBUF, SO_SNDBUF, IPPROTO_IP
+from socket import inet_aton, gethostbyname, htons
+import errno
+from threading import local
+
+BATCH = 32 # Datagrams moved per syscall
+
+MSG_WAITFORONE = 0x10000 # Block for the first datagram only, then take whatever else is queued
+
+# Kernel socket buffer sizes, large enough to absorb a burst of replies without dropping datagrams
+RCVBUF_SIZE = 4*1024*1024
+SNDBUF_SIZE = 1*1024*1024
+
+# Linux values, not exported by the socket module; set so datagrams are never fragmented
+IP_MTU_DISCOVER = 10
+IP_PMTUDISC_DO = 2
+
+
+class iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p),
+                ("iov_len", ctypes.c_size_t)]
+
+
+class msghdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p),
+                ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(iovec)),
+                ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p),
+                ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+
+class mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", msghdr),
+                ("msg_len", ctypes.c_uint)]
+
+
+class sockaddr_in(ctypes.Structure):
+    _fields_ = [("sin_family", ctypes.c_ushort),
+                ("sin_port", ctypes.c_uint16), # Network byte order
+                ("sin_addr", ctypes.c_ubyte * 4),
+                ("sin_zero", ctypes.c_ubyte * 8)]
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True) # libc is already loaded into the process; no library search needed
+        libc.recvmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+        libc.sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+_libc = _load_libc()
+
+
+def tune_socket(sock: socket, addr: tuple[str, int] | None = None) -> socket:
+    """
+    Gives sock large kernel buffers and, on Linux, no fragmentation. With addr, it is also bound there with the port
+    shared, since several sockets (listener threads, group members) bind the same one. Returns sock.
+    """
+    sock.setsockopt(SOL_SOCKET, SO_RCVBUF, RCVBUF_SIZE)
+    sock.setsockopt(SOL_SOCKET, SO_SNDBUF, SNDBUF_SIZE)
+    if sys.platform.startswith("linux"):
+        sock.setsockopt(IPPROTO_IP, IP_MTU_DISCOVER, IP_PMTUDISC_DO)
+    if addr is not None:
+        sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        sock.setsockopt(SOL_SOCKET, SO_REUSEPORT, 1)
+        sock.bind(addr)
+    return sock
+
+
+class Receiver():
+    """
+    Preallocated buffers for receiving up to BATCH datagrams from a socket in one syscall.
+    """
+    def __init__(self, buffer_size: int, batch: int = BATCH) -> None:
+        self.buffer_size = buffer_size
+        self.batch = batch
+        self.buf = bytearray(batch * buffer_size)
+        self.view = memoryview(self.buf)
+        # One view per datagram slot, so a receive only has to trim a slot to the datagram length
+        self.slots = [self.view[i*buffer_size : (i+1)*buffer_size] for i in range(batch)]
+        if _libc is not None:
+            base = ctypes.addressof(ctypes.c_char.from_buffer(self.buf))
+            self.iovs = (iovec * batch)()
+            self.msgs = (mmsghdr * batch)()
+            for i in range(batch):
+                self.iovs[i].iov_base = base + i * buffer_size
+                self.iovs[i].iov_len = buffer_size
+                self.msgs[i].msg_hdr.msg_iov = ctypes.pointer(self.iovs[i])
+                self.msgs[i].msg_hdr.msg_iovlen = 1
+
+    def recv(self, sock, block: bool = True) -> list[memoryview]:
+        """
+        Return every datagram that can be received in one batch. If block is set, wait until at least one arrives;
+        otherwise return an empty list when none are queued.
+        The returned views are only valid until the next call.
+        """
+        slots = self.slots
+        if _libc is None:
+            # One datagram per syscall: wait for the first, then take whatever else is already queued
+            received = []
+            if block:
+                received.append(slots[0][:sock.recv_into(slots[0])])
+            try:
+                while len(received) < self.batch:
+                    slot = slots[len(received)]
+                    received.append(slot[:sock.recv_into(slot, 0, MSG_DONTWAIT)])
+            except BlockingIOError:
+                pass
+            return received
+        while True:
+            n = _libc.recvmmsg(sock.fileno(), ctypes.addressof(self.msgs), self.batch,
+                               MSG_WAITFORONE if block else MSG_DONTWAIT, None)
+            if n >= 0:
+                break
+            err = ctypes.get_errno()
+            # Retried on a signal, as the socket module does since PEP 475; any Python handler runs between attempts
+            if err == errno.EINTR:
+                continue
+            if not block and err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return []
+            raise OSError(err, os.strerror(err))
+        msgs = self.msgs
+        return [slots[i][:msgs[i].msg_len] for i in range(n)]
+
+    def drain(self, sock):
+        """
+        Wait for datagrams, then keep yielding batches until the socket's queue is empty, so a burst is
+        handled on a single wake. Each batch is only valid until the next one is yielded.
+        """
+        batch = self.recv(sock)
+        yield batch
+        while len(batch) == self.batch: # A full batch means more may be queued
+            batch = self.recv(sock, block=False)
+            if not batch:
+                return
+            yield batch
+
+
+_sockaddrs: dict[tuple[str, int], sockaddr_in] = {} # (hostname, port) -> sockaddr_in; hosts never move, so each is resolved once
+
+def _sockaddr(addr: tuple[str, int]) -> sockaddr_in:
+    sa = _sockaddrs.get(addr)
+    if sa is None:
+        sa = sockaddr_in()
+        sa.sin_family = AF_INET
+        sa.sin_port = htons(int(addr[1]))
+        ctypes.memmove(sa.sin_addr, inet_aton(gethostbyname(addr[0])), 4)
+        _sockaddrs[addr] = sa
+    return sa
+
+
+def sendmmsg(sock, datagrams: list[tuple[bytes, tuple[str, int]]]) -> None:
+    """
+    Send every (payload, (hostname, port)) pair in datagrams, BATCH at a time.
+    """
+    if _libc is None:
+        for payload, addr in datagrams:
+            sock.sendto(payload, addr)
+        return
+    count = len(datagrams)
+    msgs = (mmsghdr * count)()
+    iovs = (iovec * count)()
+    buffers: dict[int, ctypes.Array[ctypes.c_char]] = {} # id(payload) -> C copy; a payload sent to many hosts is only copied once
+    for i, (payload, addr) in enumerate(datagrams):
+        data = buffers.get(id(payload))
+        if data is None:
+            data = buffers[id(payload)] = ctypes.create_string_buffer(payload, len(payload))
+        _fill(msgs[i], iovs[i], data, len(payload), addr)
+    _send(sock, msgs, count)
+
+
+def sendmmsg_to(sock, payload: bytes, addrs: tuple[tuple[str, int], ...]) -> None:
+    """
+    Send one payload to every (hostname, port) in addrs, BATCH at a time.
+    """
+    if _libc is None:
+        for addr in addrs:
+            sock.sendto(payload, addr)
+        return
+    count = len(addrs)
+    data = ctypes.create_string_buffer(payload, len(payload)) # Copied once, shared by every datagram
+    groups = _groups.headers # Per thread, since the headers are rewritten on every send
+    group = groups.get(addrs)
+    if group is None:
+        # The destinations of a group never change, so its headers are built once and only the payload is swapped in
+        msgs = (mmsghdr * count)()
+        iovs = (iovec * count)()
+        for i, addr in enumerate(addrs):
+            _fill(msgs[i], iovs[i], data, len(payload), addr)
+        group = groups[addrs] = (msgs, iovs)
+    msgs, iovs = group
+    base = ctypes.addressof(data)
+    for iov in iovs:
+        iov.iov_base = base
+        iov.iov_len = len(payload)
+    _send(sock, msgs, count)
+
+class _Groups(local):
+    def __init__(self) -> None:
+        # addrs tuple -> (msgs, iovs) prebuilt for that group of destinations; set up anew in each thread
+        self.headers: dict[tuple[tuple[str, int], ...], tuple[ctypes.Array[mmsghdr], ctypes.Array[iovec]]] = {}
+
+_groups = _Groups()
+
+
+def _fill(msg: mmsghdr, iov: iovec, data, size: int, addr: tuple[str, int]) -> None:
+    sa = _sockaddr(addr)
+    iov.iov_base = ctypes.addressof(data)
+    iov.iov_len = size
+    msg.msg_hdr.msg_name = ctypes.addressof(sa)
+    msg.msg_hdr.msg_namelen = ctypes.sizeof(sa)
+    msg.msg_hdr.msg_iov = ctypes.pointer(iov)
+    msg.msg_hdr.msg_iovlen = 1
+
+
+def _send(sock, msgs, count: int) -> None:
+    sent = 0
+    while sent < count:
+        n = _libc.sendmmsg(sock.fileno(), ctypes.addressof(msgs) + sent * ctypes.sizeof(mmsghdr), min(count - sent, BATCH), 0)
+        if n < 0:
+            err = ctypes.get_errno()
+            if err == errno.EINTR: # Retried as in Receiver.recv
+                continue
+            raise OSError(err, os.strerror(err))
+        sent += n
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Wire format shared by the ClientNode and ConsensusNode classes.
+
+Every message is a fixed struct layout starting with the 4-byte MAGIC, a 1-byte
+tag naming the header, and the sender's UID; no message is pickled. The body
+depends on the header:
+    FWD, SET, TERM, TOKEN:                      one integer
+    PROPOSAL, NACK, ACCEPT, ACCEPT-VALUE, LEARN: the pair (v, n)
+    ACK:                                        (n, v, n'), where n' may be "_"
+    ROLE:                                       the Role, as one byte
+    START:                                      the three list lengths, then every UID
+
+Datagrams without the MAGIC, with an unknown tag, or too short for their layout
+are rejected before any decoding.
+"""
+from __future__ import annotations
+import struct
+from enum import IntEnum
+
+MAGIC = b"PAX2" # Protocol marker and version at the start of every message
+
+FIXED = struct.Struct("!4scIq") # magic, tag, sender UID, integer value
+PAIR = struct.Struct("!4scIqq") # magic, tag, sender UID, v, n
+ACK_LAYOUT = struct.Struct("!4scIqqq?") # magic, tag, sender UID, n, v, n', whether n' is set
+ROLE_LAYOUT = struct.Struct("!4scIB") # magic, tag, sender UID, Role value
+PREFIX = struct.Struct("!4scI") # magic, tag, sender UID; START's counts and UIDs follow
+ROLE_COUNTS = struct.Struct("!III") # START: number of proposers, acceptors, and learners
+UID = struct.Struct("!I") # START: one node UID, repeated for every node after ROLE_COUNTS
+UIDS_OFFSET = PREFIX.size + ROLE_COUNTS.size # Where START's UIDs begin
+
+# Single byte tags for every header
+FWD = b"F"
+SET = b"S"
+TERM = b"T"
+START = b"R"
+TOKEN = b"K"
+ROLE = b"O"
+PROPOSAL = b"P"
+NACK = b"N"
+ACK = b"A"
+ACCEPT = b"C"
+ACCEPT_VALUE = b"V"
+LEARN = b"L"
+
+TAGS = {"FWD": FWD, "SET": SET, "TERM": TERM, "START": START, "TOKEN": TOKEN, "ROLE": ROLE,
+        "PROPOSAL": PROPOSAL, "NACK": NACK, "ACK": ACK, "ACCEPT": ACCEPT, "ACCEPT-VALUE": ACCEPT_VALUE, "LEARN": LEARN}
+HEADERS = {tag: header for header, tag in TAGS.items()}
+
+INT_TAGS = frozenset((FWD, SET, TERM, TOKEN))
+PAIR_TAGS = frozenset((PROPOSAL, NACK, ACCEPT, ACCEPT_VALUE, LEARN))
+
+
+class Role(IntEnum):
+    """
+    A consensus node's role; ROLE messages carry its value as one byte.
+    """
+    PROPOSER = 0
+    ACCEPTOR = 1
+    LEARNER = 2
+
+    def __str__(self) -> str:
+        return self.name
+
+
+NO_VALUE = "_" # The n' of an ack(n,v,_) sent before anything was accepted
+TOKEN_TERM = -1 # TOKEN's "TERM" (end of leader election); real tokens are UIDs, which are never negative
+
+
+def pack(header: str, message, senderid: int) -> bytes:
+    """
+    Serialize a message to byte form.
+
+    Parameters:
+        header (str): The header that defines the message type
+        message: The message body
+        senderid (int): The UID of the sending host
+    """
+    layout, fields = _layout(header, message, senderid)
+    return layout.pack(*fields)
+
+
+def pack_into(buffer, header: str, message, senderid: int) -> int:
+    """
+    Serialize a message into the start of a writable buffer, so a reused buffer needs no new bytes object.
+    Returns the number of bytes written.
+
+    Parameters:
+        buffer: A writable buffer, large enough for the message
+        header (str): The header that defines the message type
+        message: The message body
+        senderid (int): The UID of the sending host
+    """
+    layout, fields = _layout(header, message, senderid)
+    layout.pack_into(buffer, 0, *fields)
+    return layout.size
+
+
+def _layout(header: str, message, senderid: int) -> tuple[struct.Struct, tuple]:
+    tag = TAGS[header]
+    if tag in PAIR_TAGS:
+        v, n = message
+        return PAIR, (MAGIC, tag, senderid, v, n)
+    if tag is ACK:
+        n1, v, n2 = message
+        if n2 == NO_VALUE:
+            return ACK_LAYOUT, (MAGIC, tag, senderid, n1, v, 0, False)
+        return ACK_LAYOUT, (MAGIC, tag, senderid, n1, v, n2, True)
+    if tag is ROLE:
+        return ROLE_LAYOUT, (MAGIC, tag, senderid, message)
+    if tag is START:
+        proposers, acceptors, learners = message
+        uids = (*proposers, *acceptors, *learners)
+        return _start_layout(len(uids)), (MAGIC, tag, senderid, len(proposers), len(acceptors), len(learners), *uids)
+    if tag is TOKEN and message == "TERM":
+        message = TOKEN_TERM
+    # FWD, SET, TERM, and TOKEN; TERM has no body so it is sent as 0
+    return FIXED, (MAGIC, tag, senderid, message if isinstance(message, int) else 0)
+
+
+_start_layouts: dict[int, struct.Struct] = {} # UID count -> compiled START layout
+
+def _start_layout(count: int) -> struct.Struct:
+    layout = _start_layouts.get(count)
+    if layout is None:
+        # PREFIX, then ROLE_COUNTS, then the UIDs
+        layout = _start_layouts[count] = struct.Struct(f"{PREFIX.format}{ROLE_COUNTS.format[1:]}{count}{UID.format[1:]}")
+    return layout
+
+
+def max_size(role_count: int) -> int:
+    """
+    Size in bytes of the largest message exchanged when role_count nodes are assigned roles (START grows with it).
+    """
+    return max(ACK_LAYOUT.size, _start_layout(role_count).size)
+
+
+def check_fits(role_count: int, buffer_size: int) -> None:
+    """
+    Raises ValueError if a message among role_count nodes could be longer than buffer_size, since such a datagram
+    would be truncated on receipt and dropped.
+    """
+    size = max_size(role_count)
+    if size > buffer_size:
+        raise ValueError(f"Too many nodes for a {buffer_size} byte buffer: START would be {size} bytes")
+
+
+def unpack(data) -> dict | None:
+    """
+    Deserialize a message into a dictionary with keys HEADER, MESSAGE, and SENDERID.
+    Returns None for datagrams that are not Paxos messages (wrong magic, unknown tag, or truncated), so callers can drop them.
+    """
+    if data[:4] != MAGIC:
+        return None
+    try:
+        header, decoder = _DECODERS[data[4]] # An int for bytes and memoryviews alike, so no slice is built
+        return decoder(header, data)
+    except (struct.error, KeyError, ValueError, IndexError):
+        return None
+
+
+def peek_tag(data) -> bytes | None:
+    """
+    Returns the tag byte of a message without decoding it, or None if data is not a Paxos message.
+    """
+    if data[:4] != MAGIC:
+        return None
+    return bytes(data[4:5])
+
+
+def _unpack_pair(header: str, data) -> dict:
+    _, _, senderid, v, n = PAIR.unpack_from(data)
+    return {'HEADER': header, 'MESSAGE': (v, n), 'SENDERID': senderid}
+
+
+def _unpack_ack(header: str, data) -> dict:
+    _, _, senderid, n1, v, n2, has_n2 = ACK_LAYOUT.unpack_from(data)
+    return {'HEADER': header, 'MESSAGE': (n1, v, n2 if has_n2 else NO_VALUE), 'SENDERID': senderid}
+
+
+def _unpack_role(header: str, data) -> dict:
+    _, _, senderid, role = ROLE_LAYOUT.unpack_from(data)
+    return {'HEADER': header, 'MESSAGE': Role(role), 'SENDERID': senderid}
+
+
+def _unpack_start(header: str, data) -> dict:
+    _, _, senderid = PREFIX.unpack_from(data)
+    counts = ROLE_COUNTS.unpack_from(data, PREFIX.size)
+    count = sum(counts)
+    # The counts come from the datagram, so they must match its length; no layout is compiled for them on receipt
+    carried = len(data) - UIDS_OFFSET
+    if count * UID.size != carried:
+        raise ValueError(f"START announces {count} UIDs but carries {carried} bytes")
+    uids = [uid for (uid,) in UID.iter_unpack(data[UIDS_OFFSET:])]
+    roles = []
+    start = 0
+    for size in counts:
+        roles.append(uids[start:start+size])
+        start += size
+    return {'HEADER': header, 'MESSAGE': tuple(roles), 'SENDERID': senderid}
+
+
+def _unpack_fixed(header: str, data) -> dict:
+    _, _, senderid, value = FIXED.unpack_from(data)
+    return {'HEADER': header, 'MESSAGE': value, 'SENDERID': senderid}
+
+
+def _unpack_token(header: str, data) -> dict:
+    _, _, senderid, value = FIXED.unpack_from(data)
+    return {'HEADER': header, 'MESSAGE': "TERM" if value == TOKEN_TERM else value, 'SENDERID': senderid}
+
+
+# Tag byte (as an int) -> (header, decoder for that tag's layout)
+_LAYOUT_DECODERS = {ACK: _unpack_ack, ROLE: _unpack_role, START: _unpack_start, TOKEN: _unpack_token}
+_DECODERS = {tag[0]: (header, _unpack_pair if tag in PAIR_TAGS else _LAYOUT_DECODERS.get(tag, _unpack_fixed))
+             for header, tag in TAGS.items()}
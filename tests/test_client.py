@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the ClientNode listener: malformed datagrams must be dropped without stopping it.
+"""
+import socket
+import unittest
+
+from paxos import wire
+from paxos.client import ClientNode
+
+TIMEOUT = 2.0
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp_socket:
+        udp_socket.bind(("localhost", 0))
+        return udp_socket.getsockname()[1]
+
+
+class ClientListenerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.port = free_port()
+        # A lone client; its listener never needs any consensus node to be up
+        self.node = ClientNode((1,1,1), [["localhost", self.port, "cli"]], 0, 5, 0)
+        self.sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def tearDown(self) -> None:
+        # recv_socket is left open: the listener thread still blocks on its fd
+        self.sender.close()
+        self.node.send_socket.close()
+        self.node.proposer_socket.close()
+
+    def send(self, data: bytes) -> None:
+        self.sender.sendto(data, ("localhost", self.port))
+
+    def test_short_set_is_dropped(self) -> None:
+        self.send(b"PAX2S\0\0\0")
+        self.send(wire.pack("START", ([1],[2],[3]), 4))
+        self.assertTrue(self.node.start_received.wait(TIMEOUT))
+        self.assertTrue(self.node.listener.is_alive())
+
+    def test_malformed_start_is_dropped(self) -> None:
+        self.send(wire.pack("START", ([1],[2],[3]), 4)[:-1])
+        self.send(wire.pack("START", ([1],[2],[3]), 4))
+        self.assertTrue(self.node.start_received.wait(TIMEOUT))
+        self.assertEqual(self.node.start_roles, ([1],[2],[3]))
+
+    def test_set_after_bad_datagrams(self) -> None:
+        self.send(b"PAX2S")
+        self.send(b"PAX2R\0")
+        self.send(wire.pack("SET", 7, 9))
+        self.assertEqual(self.node.message_queue.get(timeout=TIMEOUT), ("SET", 7))
+        self.assertEqual(self.node.learners_heard, {9})
+
+    def test_set_before_initialize(self) -> None:
+        with self.assertRaises(RuntimeError):
+            self.node.Set(5)
+
+
+if __name__ == "__main__":
+    unittest.main()
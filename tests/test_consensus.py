@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the ConsensusNode handlers, run on nodes built without sockets or threads.
+"""
+import queue
+import unittest
+from collections import defaultdict
+from unittest import mock
+
+from paxos import consensus
+from paxos.consensus import ConsensusNode
+from paxos.hosts import Host
+from paxos.wire import Role
+
+ACCEPTORS = 3
+
+
+class Stop(Exception):
+    """
+    Raised by the STOP handler to end queue_listen.
+    """
+
+
+class RecordingNode(ConsensusNode):
+    """
+    A node whose sends are recorded instead of going out on a socket.
+    """
+    def udp_send_to(self, header, message, host) -> None:
+        self.sent.append((header, message, host.addr))
+
+    def role_multicast(self, header, message, role) -> None:
+        self.sent.append((header, message, role))
+
+    def udp_multicast(self, header, message, addrs) -> None:
+        self.sent.append((header, message, addrs))
+
+
+def make_node(role: Role) -> RecordingNode:
+    node = object.__new__(RecordingNode)
+    node.sent = []
+    node.uid = 0
+    node.role = role
+    node.hosts = [Host("localhost", 10000 + i, "con", ("127.0.0.1", 10000 + i)) for i in range(5)]
+    node.seq = node.uid
+    node.learners = []
+    node.cli_addrs = (("127.0.0.1", 10005),)
+    node.message_queue = queue.SimpleQueue()
+    node.acceptance_counts = defaultdict(int)
+    node.max_acceptance = None
+    node.pending_values = []
+    node.batch_deadline = 0.0
+    node.max_promise = -1
+    node.ack_counts = defaultdict(int)
+    node.highest_ack = None
+    node.min_majority = ACCEPTORS // 2 + 1
+    node.accept_sent = set()
+    node.set_sent = set()
+    return node
+
+
+def message(header: str, body, senderid: int = 1) -> dict:
+    return {"HEADER": header, "MESSAGE": body, "SENDERID": senderid}
+
+
+class ProposerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.node = make_node(Role.PROPOSER)
+
+    def accepts(self) -> list:
+        return [sent for sent in self.node.sent if sent[0] == "ACCEPT"]
+
+    def test_majority_threshold(self) -> None:
+        self.node.on_ack(message("ACK", (5, 55, "_")))
+        self.assertEqual(self.accepts(), [])
+        self.node.on_ack(message("ACK", (5, 55, "_"), 2))
+        self.assertEqual(self.accepts(), [("ACCEPT", (55, 5), Role.ACCEPTOR)])
+
+    def test_accept_sent_once_per_n(self) -> None:
+        for senderid in range(1, 4):
+            self.node.on_ack(message("ACK", (5, 55, "_"), senderid))
+        self.assertEqual(len(self.accepts()), 1)
+        # A new sequence number gets its own ACCEPT
+        for senderid in range(1, 3):
+            self.node.on_ack(message("ACK", (10, 56, "_"), senderid))
+        self.assertEqual(self.accepts(), [("ACCEPT", (55, 5), Role.ACCEPTOR), ("ACCEPT", (56, 10), Role.ACCEPTOR)])
+
+    def test_ack_with_prior_acceptance(self) -> None:
+        # The acceptors already accepted 44 at n=3, so the proposal at n=5 must carry 44
+        self.node.on_ack(message("ACK", (5, 44, 3), 1))
+        self.node.on_ack(message("ACK", (5, 44, 3), 2))
+        self.assertEqual(self.accepts(), [("ACCEPT", (44, 5), Role.ACCEPTOR)])
+        # Those acks also count towards n'
+        self.assertEqual(self.node.ack_counts[3], 2)
+
+    def test_highest_ack_is_kept(self) -> None:
+        self.node.on_ack(message("ACK", (10, 56, "_"), 1))
+        self.node.on_ack(message("ACK", (5, 55, "_"), 2))
+        self.assertEqual(self.node.highest_ack, (10, 56, "_"))
+
+    def test_accept_value_forwards_learn(self) -> None:
+        self.node.on_accept_value(message("ACCEPT-VALUE", (55, 5)))
+        self.assertEqual(self.node.max_acceptance, (55, 5))
+        self.assertEqual(self.node.sent, [("LEARN", (55, 5), Role.LEARNER)])
+
+
+class AcceptorTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.node = make_node(Role.ACCEPTOR)
+
+    def test_promise_without_acceptance(self) -> None:
+        self.node.on_proposal(message("PROPOSAL", (55, 5)))
+        self.assertEqual(self.node.sent, [("ACK", (5, 55, "_"), self.node.hosts[1].addr)])
+        self.assertEqual(self.node.max_promise, 5)
+
+    def test_promise_with_acceptance(self) -> None:
+        self.node.record_acceptance(44, 3)
+        self.node.on_proposal(message("PROPOSAL", (55, 5)))
+        self.assertEqual(self.node.sent, [("ACK", (5, 44, 3), self.node.hosts[1].addr)])
+
+    def test_higher_proposal_overrides_lower(self) -> None:
+        self.node.on_proposal(message("PROPOSAL", (55, 5), 1))
+        self.node.on_proposal(message("PROPOSAL", (56, 10), 2))
+        self.node.on_proposal(message("PROPOSAL", (57, 7), 3))
+        # Only the first two are promised; 7 arrived after the promise to 10
+        self.assertEqual([sent[1] for sent in self.node.sent], [(5, 55, "_"), (10, 56, "_")])
+        self.assertEqual(self.node.max_promise, 10)
+
+    def test_accept_below_promise_is_rejected(self) -> None:
+        self.node.on_proposal(message("PROPOSAL", (56, 10)))
+        self.node.sent.clear()
+        self.node.on_accept(message("ACCEPT", (55, 5)))
+        self.assertEqual(self.node.sent, [])
+        self.node.on_accept(message("ACCEPT", (56, 10)))
+        self.assertEqual(self.node.sent, [("ACCEPT-VALUE", (56, 10), Role.PROPOSER), ("LEARN", (56, 10), Role.LEARNER)])
+
+
+class LearnerTest(unittest.TestCase):
+    def test_set_sent_once_on_majority(self) -> None:
+        node = make_node(Role.LEARNER)
+        for senderid in range(1, 5):
+            node.on_learn(message("LEARN", (55, 5), senderid))
+        self.assertEqual(node.sent, [("SET", 55, node.cli_addrs)])
+
+
+class BatchDeadlineTest(unittest.TestCase):
+    def test_deadline_fires_while_queue_is_busy(self) -> None:
+        node = make_node(Role.PROPOSER)
+        clock = [0.0]
+        handled = []
+        proposed_after = []
+
+        def busy(_: dict) -> None:
+            handled.append(1)
+            clock[0] += 0.0005 # Each message takes half a millisecond to handle
+
+        def stop(_: dict) -> None:
+            raise Stop
+
+        def propose() -> None:
+            proposed_after.append(len(handled))
+            node.pending_values.clear()
+
+        table = {"FWD": node.on_fwd, "ACK": busy, "STOP": stop}
+        node.message_queue.put(message("FWD", 55))
+        for _ in range(300):
+            node.message_queue.put(message("ACK", (1, 1, "_")))
+        node.message_queue.put(message("STOP", None))
+        with mock.patch.object(consensus.time, "monotonic", lambda: clock[0]), \
+             mock.patch.object(RecordingNode, "dispatch_table", lambda self: table), \
+             mock.patch.object(RecordingNode, "propose_pending", lambda self: propose()):
+            with self.assertRaises(Stop):
+                node.queue_listen()
+        # BATCH_WINDOW is 1 ms, so the batch goes out after two busy messages, not after the queue empties
+        self.assertEqual(proposed_after, [round(consensus.BATCH_WINDOW / 0.0005)])
+
+
+if __name__ == "__main__":
+    unittest.main()
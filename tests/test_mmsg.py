@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the batched receive path: a signal arriving mid-receive must not surface as an error.
+"""
+import signal
+import socket
+import threading
+import unittest
+
+from paxos import mmsg
+
+BUFFER_SIZE = 64
+
+
+@unittest.skipUnless(hasattr(signal, "setitimer"), "needs setitimer")
+class InterruptedRecvTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.recv_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.recv_socket.bind(("localhost", 0))
+        self.send_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.previous = signal.signal(signal.SIGALRM, lambda signum, frame: None)
+        self.sender = threading.Timer(0.3, self.send_socket.sendto, (b"PAX2", self.recv_socket.getsockname()))
+
+    def tearDown(self) -> None:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, self.previous)
+        self.sender.cancel()
+        self.sender.join()
+        self.recv_socket.close()
+        self.send_socket.close()
+
+    def test_recv_retries_on_signal(self) -> None:
+        # The alarm interrupts the blocked receive well before the datagram is sent
+        signal.setitimer(signal.ITIMER_REAL, 0.05)
+        self.sender.start()
+        received = mmsg.Receiver(BUFFER_SIZE).recv(self.recv_socket)
+        self.assertEqual([bytes(datagram) for datagram in received], [b"PAX2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
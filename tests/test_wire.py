@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the wire format: every header round-trips, and malformed datagrams are rejected.
+"""
+import unittest
+
+from paxos import wire
+from paxos.wire import Role
+
+SENDER = 7
+
+# (header, message as sent, message as decoded)
+MESSAGES = [
+    ("FWD", 55, 55),
+    ("SET", 210, 210),
+    ("TERM", "", 0),
+    ("TOKEN", 4, 4),
+    ("TOKEN", "TERM", "TERM"),
+    ("ROLE", Role.PROPOSER, Role.PROPOSER),
+    ("ROLE", Role.ACCEPTOR, Role.ACCEPTOR),
+    ("ROLE", Role.LEARNER, Role.LEARNER),
+    ("PROPOSAL", (55, 3), (55, 3)),
+    ("NACK", (55, 3), (55, 3)),
+    ("ACCEPT", (55, 14), (55, 14)),
+    ("ACCEPT-VALUE", (55, 14), (55, 14)),
+    ("LEARN", (55, 14), (55, 14)),
+    ("ACK", (14, 55, "_"), (14, 55, "_")),
+    ("ACK", (14, 55, 3), (14, 55, 3)),
+    ("ACK", (14, 55, 0), (14, 55, 0)),
+    ("START", ([0], [1, 2, 3], [4]), ([0], [1, 2, 3], [4])),
+    ("START", ([0, 1, 2], [3, 4, 5], [6, 7, 8, 9, 10]), ([0, 1, 2], [3, 4, 5], [6, 7, 8, 9, 10])),
+]
+
+
+class RoundTripTest(unittest.TestCase):
+    def test_every_header_is_covered(self) -> None:
+        self.assertEqual({header for header, _, _ in MESSAGES}, set(wire.TAGS))
+
+    def test_pack_unpack(self) -> None:
+        for header, sent, decoded in MESSAGES:
+            with self.subTest(header=header, message=sent):
+                data = wire.pack(header, sent, SENDER)
+                self.assertEqual(wire.unpack(data), {"HEADER": header, "MESSAGE": decoded, "SENDERID": SENDER})
+                # Receivers decode straight out of their buffers
+                self.assertEqual(wire.unpack(memoryview(bytearray(data))), wire.unpack(data))
+
+    def test_pack_into(self) -> None:
+        buffer = bytearray(4096)
+        for header, sent, decoded in MESSAGES:
+            with self.subTest(header=header, message=sent):
+                size = wire.pack_into(buffer, header, sent, SENDER)
+                self.assertEqual(bytes(buffer[:size]), wire.pack(header, sent, SENDER))
+
+    def test_decoded_types(self) -> None:
+        self.assertIs(type(wire.unpack(wire.pack("ROLE", Role.LEARNER, SENDER))["MESSAGE"]), Role)
+        self.assertEqual(wire.unpack(wire.pack("ACK", (14, 55, "_"), SENDER))["MESSAGE"][2], wire.NO_VALUE)
+
+    def test_check_fits(self) -> None:
+        wire.check_fits(11, 4096)
+        with self.assertRaises(ValueError):
+            wire.check_fits(2000, 4096)
+
+    def test_peek_tag(self) -> None:
+        self.assertEqual(wire.peek_tag(wire.pack("SET", 1, SENDER)), wire.SET)
+        self.assertIsNone(wire.peek_tag(b"PAX1S"))
+
+
+class RejectTest(unittest.TestCase):
+    def test_no_magic(self) -> None:
+        for data in (b"", b"PAX", b"PAX1" + wire.pack("SET", 1, SENDER)[4:], b"\x80\x04\x95"):
+            with self.subTest(data=data):
+                self.assertIsNone(wire.unpack(data))
+
+    def test_unknown_tag(self) -> None:
+        self.assertIsNone(wire.unpack(wire.MAGIC))
+        self.assertIsNone(wire.unpack(wire.MAGIC + b"Z" + bytes(16)))
+
+    def test_truncated_body(self) -> None:
+        for header, sent, _ in MESSAGES:
+            data = wire.pack(header, sent, SENDER)
+            for size in range(5, len(data)):
+                with self.subTest(header=header, size=size):
+                    self.assertIsNone(wire.unpack(data[:size]))
+
+    def test_start_length_mismatch(self) -> None:
+        data = wire.pack("START", ([0], [1], [2]), SENDER)
+        self.assertIsNone(wire.unpack(data + bytes(4)))
+        # Counts claiming more UIDs than the datagram carries must not compile and cache a layout for them
+        layouts = len(wire._start_layouts)
+        offset = wire.PREFIX.size # Where the three counts start
+        forged = data[:offset] + wire.ROLE_COUNTS.pack(100000, 0, 0) + data[offset + wire.ROLE_COUNTS.size:]
+        self.assertIsNone(wire.unpack(forged))
+        self.assertEqual(len(wire._start_layouts), layouts)
+
+
+if __name__ == "__main__":
+    unittest.main()